@@ -17,6 +17,7 @@ class Settings(BaseSettings):
     sheets_id: str = Field(..., env="SHEETS_ID")
     google_service_file: str = Field("credentials.json", env="GOOGLE_SERVICE_FILE")
     refresh_sec: int = Field(300, env="REFRESH_SEC")
+    write_flush_sec: int = Field(5, env="WRITE_FLUSH_SEC")
     log_level: str = Field("INFO", env="LOG_LEVEL")
     admin_ids: list[int] = Field(default_factory=list, env="ADMIN_IDS")
 
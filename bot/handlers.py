@@ -25,6 +25,11 @@ GEO_FLAGS = {
 }
 
 MAX_MSG = 4000  # предел для текста (чуть меньше 4096 для запаса)
+GEO_ROW = 4         # GEO-кнопок в ряду
+GEO_PAGE_SIZE = 40  # GEO-кнопок на страницу (Telegram режет клавиатуры > 100 кнопок)
+
+# Кэш GEO-клавиатур: (номер снапшота, страницы)
+_geo_kb_cache: tuple[int, list[InlineKeyboardMarkup]] | None = None
 
 # ---------- Хелперы ----------
 def _get(o, name, default: str = "-"):
@@ -50,22 +55,43 @@ def main_menu() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="🔄 Обновить кэш", callback_data="update_cache")]
     ])
 
-def geos_keyboard(geos: list[str]) -> InlineKeyboardMarkup:
+def geos_keyboard(counts: dict[str, int], page: int = 1, total: int = 1) -> InlineKeyboardMarkup:
+    """Одна страница GEO-кнопок: «флаг GEO (кол-во офферов)» по GEO_ROW в ряд."""
     keyboard: list[list[InlineKeyboardButton]] = []
     row: list[InlineKeyboardButton] = []
-    for geo in geos:
+    for geo, n in counts.items():
         flag = GEO_FLAGS.get(geo.upper(), "🏳️")
-        row.append(InlineKeyboardButton(text=f"{flag} {geo}", callback_data=f"geo:{geo}"))
-        if len(row) == 4:
+        row.append(InlineKeyboardButton(text=f"{flag} {geo} ({n})", callback_data=f"geo:{geo}"))
+        if len(row) == GEO_ROW:
             keyboard.append(row)
             row = []
     if row:
         keyboard.append(row)
+    if total > 1:
+        keyboard += pager_kb("geo_menu", page=page, total=total).inline_keyboard
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+def build_geo_pages(counts: dict[str, int]) -> list[InlineKeyboardMarkup]:
+    """Режет список GEO на страницы по GEO_PAGE_SIZE кнопок."""
+    items = list(counts.items())
+    chunks = [items[i:i + GEO_PAGE_SIZE] for i in range(0, len(items), GEO_PAGE_SIZE)]
+    return [geos_keyboard(dict(c), page=i, total=len(chunks)) for i, c in enumerate(chunks, start=1)]
+
+async def geo_pages() -> list[InlineKeyboardMarkup]:
+    """
+    Готовые GEO-клавиатуры для текущего снапшота офферов.
+    Строятся один раз после каждой перезагрузки кэша и общие для всех пользователей.
+    """
+    global _geo_kb_cache
+    await sheets.get_offers()  # подтянуть свежий снапшот, если TTL истёк
+    ver = sheets.snapshot_version()
+    if _geo_kb_cache is None or _geo_kb_cache[0] != ver:
+        _geo_kb_cache = (ver, build_geo_pages(await sheets.geo_counts()))
+    return _geo_kb_cache[1]
+
 def pager_kb(kind: str, page: int, total: int, extra: str | None = None) -> InlineKeyboardMarkup:
     """
-    kind: 'all' | 'geo'
+    kind: 'all' | 'geo' | 'geo_menu'
     extra: для geo — сам GEO (например 'BR')
     """
     buttons: list[InlineKeyboardButton] = []
@@ -76,6 +102,10 @@ def pager_kb(kind: str, page: int, total: int, extra: str | None = None) -> Inli
         buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"all_offers:{prev_page}"))
         buttons.append(InlineKeyboardButton(text=f"{page}/{total}", callback_data="noop"))
         buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"all_offers:{next_page}"))
+    elif kind == "geo_menu":
+        buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"geo_menu:{prev_page}"))
+        buttons.append(InlineKeyboardButton(text=f"{page}/{total}", callback_data="noop"))
+        buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"geo_menu:{next_page}"))
     else:  # geo
         geo = extra or ""
         buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"geo_pg:{geo}:{prev_page}"))
@@ -85,13 +115,24 @@ def pager_kb(kind: str, page: int, total: int, extra: str | None = None) -> Inli
     rows = [buttons, [InlineKeyboardButton(text="🏠 Меню", callback_data="home")]]
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
+def offer_admin_kb(o) -> InlineKeyboardMarkup:
+    """Кнопки админа под карточкой оффера."""
+    top_text = "⭐ Убрать из топа" if sheets.is_top(o) else "⭐ В топ"
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=top_text, callback_data=f"top_toggle:{o.row}")],
+        [InlineKeyboardButton(text="🏠 Меню", callback_data="home")],
+    ])
+
 # ---------- Рендер оффера и разбиение на страницы ----------
-def render_offer_block(o) -> str:
+def render_offer_block(o, show_id: bool = False) -> str:
+    """show_id — показать номер строки в листе (только для админских карточек)."""
     geo_val = str(_get(o, "geo", ""))  # пустая строка, чтобы флаг корректно дефолтился
     flag = GEO_FLAGS.get(geo_val.upper(), "🏳️")
+    id_line = f"🆔 <b>ID:</b> {_esc(_get(o, 'row'))}\n" if show_id else ""
 
     return (
         f"<b>{_esc(_get(o, 'name'))}</b>\n"
+        f"{id_line}"
         f"🌍 <b>GEO:</b> {flag} {_esc(geo_val)}\n"
         f"📲 <b>Трафик:</b> {_esc(_get(o, 'traffic'))}\n"
         f"💰 <b>Оплата:</b> {_esc(_get(o, 'payout'))}\n"
@@ -137,14 +178,41 @@ async def back_home(cb: CallbackQuery):
 
 @router.callback_query(F.data == "geo_menu")
 async def geo_menu(cb: CallbackQuery):
-    geos = await sheets.geos()
-    if not geos:
+    pages = await geo_pages()
+    if not pages:
+        await cb.message.edit_text("Нет доступных стран.", reply_markup=main_menu())
+        await cb.answer()
+        return
+    await cb.message.edit_text(
+        "<b>Выберите страну (GEO):</b>",
+        reply_markup=pages[0],
+        parse_mode="HTML"
+    )
+    await cb.answer()
+
+@router.callback_query(F.data.startswith("geo_menu:"))
+async def geo_menu_page(cb: CallbackQuery):
+    # callback_data формат: geo_menu:{page}
+    try:
+        _, page_str = cb.data.split(":", 1)
+        page = int(page_str)
+    except Exception:
+        await cb.answer()
+        return
+
+    pages = await geo_pages()
+    if not pages:
         await cb.message.edit_text("Нет доступных стран.", reply_markup=main_menu())
         await cb.answer()
         return
+
+    total = len(pages)
+    if page < 1 or page > total:
+        page = 1
+
     await cb.message.edit_text(
         "<b>Выберите страну (GEO):</b>",
-        reply_markup=geos_keyboard(geos),
+        reply_markup=pages[page - 1],
         parse_mode="HTML"
     )
     await cb.answer()
@@ -259,6 +327,86 @@ async def update_cache(cb: CallbackQuery):
     await cb.message.edit_text("🔄 Кэш обновлён!", reply_markup=main_menu())
     await cb.answer()
 
+# --- правка офферов админом: /offer, /status, /cap, /top ---
+@router.message(F.text.regexp(r"^/offer\s+\d+$"))
+async def offer_card(msg: Message):
+    # только админ
+    if msg.from_user.id not in settings.admin_ids:
+        await msg.answer("Нет доступа.")
+        return
+    row = int(msg.text.split()[1])
+    offer = await sheets.offer_by_row(row)
+    if offer is None:
+        await msg.answer(f"🙅 Оффер не найден: <code>{row}</code>", parse_mode="HTML")
+        return
+    await msg.answer(render_offer_block(offer, show_id=True).rstrip(), parse_mode="HTML", reply_markup=offer_admin_kb(offer))
+
+@router.message(F.text.regexp(r"^/(status|cap)\s+\d+\s+\S"))
+async def edit_offer_field(msg: Message):
+    # только админ
+    if msg.from_user.id not in settings.admin_ids:
+        await msg.answer("Нет доступа.")
+        return
+    cmd, row_str, value = msg.text.split(maxsplit=2)
+    field = "status" if cmd == "/status" else "cap_day"
+    offer = await sheets.edit_offer(int(row_str), field, value.strip())
+    if offer is None:
+        await msg.answer(f"🙅 Оффер не найден: <code>{row_str}</code>", parse_mode="HTML")
+        return
+    await msg.answer(
+        "✅ Обновлено\n\n" + render_offer_block(offer, show_id=True).rstrip(),
+        parse_mode="HTML",
+        reply_markup=offer_admin_kb(offer),
+    )
+
+@router.message(F.text.regexp(r"^/top\s+\d+$"))
+async def toggle_top_cmd(msg: Message):
+    # только админ
+    if msg.from_user.id not in settings.admin_ids:
+        await msg.answer("Нет доступа.")
+        return
+    row = int(msg.text.split()[1])
+    offer = await sheets.offer_by_row(row)
+    if offer is None:
+        await msg.answer(f"🙅 Оффер не найден: <code>{row}</code>", parse_mode="HTML")
+        return
+    offer = await sheets.set_top(row, not sheets.is_top(offer))
+    if offer is None:
+        await msg.answer(f"🙅 Оффер не найден: <code>{row}</code>", parse_mode="HTML")
+        return
+    await msg.answer(
+        "✅ Обновлено\n\n" + render_offer_block(offer, show_id=True).rstrip(),
+        parse_mode="HTML",
+        reply_markup=offer_admin_kb(offer),
+    )
+
+@router.callback_query(F.data.startswith("top_toggle:"))
+async def toggle_top_cb(cb: CallbackQuery):
+    if cb.from_user.id not in settings.admin_ids:
+        await cb.answer("Нет доступа", show_alert=True)
+        return
+    # callback_data формат: top_toggle:{row}
+    try:
+        row = int(cb.data.split(":", 1)[1])
+    except Exception:
+        await cb.answer()
+        return
+
+    offer = await sheets.offer_by_row(row)
+    if offer is None:
+        await cb.answer("Оффер не найден", show_alert=True)
+        return
+    offer = await sheets.set_top(row, not sheets.is_top(offer))
+    if offer is None:
+        await cb.answer("Оффер не найден", show_alert=True)
+        return
+    await cb.message.edit_text(
+        render_offer_block(offer, show_id=True).rstrip(),
+        parse_mode="HTML",
+        reply_markup=offer_admin_kb(offer),
+    )
+    await cb.answer("Топ включён" if sheets.is_top(offer) else "Топ снят")
+
 # --- доступ: /myid, /allow, /deny, /partners ---
 @router.message(F.text == "/myid")
 async def my_id(msg: Message):
@@ -1,8 +1,10 @@
 import asyncio
+import contextlib
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from loguru import logger
 
+from bot import sheets
 from bot.config import settings
 from bot.handlers import router
 from bot.access_middleware import AccessMiddleware 
@@ -21,11 +23,23 @@ async def main():
   
     await bot.delete_webhook(drop_pending_updates=False)
 
+    # правки админов пишутся в лист в фоне
+    writer = asyncio.create_task(sheets.write_behind_loop())
+
     logger.info("Starting polling…")
-    await dp.start_polling(
-        bot,
-        allowed_updates=dp.resolve_used_update_types()
-    )
+    try:
+        await dp.start_polling(
+            bot,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+    finally:
+        writer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await writer
+        try:
+            await sheets.flush_edits()
+        except Exception as exc:
+            logger.warning(f"Final flush of offer edits failed: {exc}")
 
 if __name__ == "__main__":
     try:
@@ -2,12 +2,16 @@
 from __future__ import annotations
 
 import os
+import re
 import json
 import time
-from typing import List, Iterable, Any, Set
+import asyncio
+from typing import List, Iterable, Any, Set, Dict
 from dataclasses import dataclass
 
 import gspread_asyncio
+from gspread.utils import rowcol_to_a1
+from loguru import logger
 from google.oauth2.service_account import Credentials
 
 from bot.config import settings
@@ -29,6 +33,7 @@ class Offer:
     status: str
     manager: str
     date_added: str
+    row: int = 0  # номер строки в листе (1-based), 0 — неизвестно
 
 
 # --------- Creds: ENV или файл ---------
@@ -57,6 +62,7 @@ def get_agcm():
 # --------- Кэш офферов ---------
 _cache: List[Offer] = []
 _cache_ts: float | None = None
+_cache_ver: int = 0  # номер снапшота, растёт при каждой перезагрузке
 
 def _cache_expired() -> bool:
     if _cache_ts is None:
@@ -66,18 +72,19 @@ def _cache_expired() -> bool:
 
 
 # --------- Парс строки ---------
-def _offer_from_row(row: Iterable[Any]) -> Offer:
+def _offer_from_row(row: Iterable[Any], row_no: int = 0) -> Offer:
     r = ["" if v is None else str(v) for v in row]
     r += [""] * (14 - len(r))  # подстраховка по длине
     return Offer(
         name=r[1], geo=r[2], traffic=r[3], payout=r[4],
         cap_day=r[5], capa_status=r[6], profit=r[7], kpi=r[8],
         epc=r[9], description=r[10], status=r[11], manager=r[12], date_added=r[13],
+        row=row_no,
     )
 
 
 # --------- Загрузка из Google Sheets ---------
-async def _query() -> List[Offer]:
+async def _offers_ws():
     # 1) имя листа из ENV, если задано; 2) иначе твой хардкод; 3) иначе первый лист
     worksheet_name = os.environ.get("SHEETS_WORKSHEET") or "TopRange Caps ОБЩАЯ"
 
@@ -94,34 +101,264 @@ async def _query() -> List[Offer]:
             ws = await sh.get_worksheet(0)
     else:
         ws = await sh.get_worksheet(0)
+    return ws
 
+
+async def _query() -> List[Offer]:
+    ws = await _offers_ws()
     rows = await ws.get_all_values()
     offers: List[Offer] = []
-    for row in rows[1:]:  # пропускаем заголовок
+    for i, row in enumerate(rows[1:], start=2):  # пропускаем заголовок
         if not row or not any(str(c).strip() for c in row):
             continue
-        offers.append(_offer_from_row(row))
+        offers.append(_offer_from_row(row, i))
     return offers
 
 
 # --------- Публичные функции (офферы) ---------
 async def get_offers(force: bool = False) -> List[Offer]:
-    global _cache, _cache_ts
+    global _cache, _cache_ts, _cache_ver
     if force or _cache_expired():
-        _cache = await _query()
+        _cache = _reconcile(await _query())
         _cache_ts = time.monotonic()
+        _cache_ver += 1
     return _cache
 
+def snapshot_version() -> int:
+    """Номер текущего снапшота офферов — для кэшей, построенных поверх него."""
+    return _cache_ver
+
 async def geos() -> List[str]:
     offers = await get_offers()
     return sorted({(o.geo or "").strip() for o in offers if (o.geo or "").strip()})
 
+async def geo_counts() -> Dict[str, int]:
+    """GEO -> количество офферов, отсортировано по GEO."""
+    counts: Dict[str, int] = {}
+    for o in await get_offers():
+        g = (o.geo or "").strip()
+        if g:
+            counts[g] = counts.get(g, 0) + 1
+    return dict(sorted(counts.items()))
+
 async def offers_by_geo(geo: str) -> List[Offer]:
     g = (geo or "").strip()
     return [o for o in await get_offers() if (o.geo or "").strip() == g]
 
+# «топ» — отдельное слово в статусе (не «Стоп» и не «Топовый»)
+_TOP_RE = re.compile(r"\bтоп\b", re.IGNORECASE)
+
+def is_top(o: Offer) -> bool:
+    return bool(_TOP_RE.search(o.status or ""))
+
 async def top_offers() -> List[Offer]:
-    return [o for o in await get_offers() if "топ" in (o.status or "").lower()]
+    return [o for o in await get_offers() if is_top(o)]
+
+async def offer_by_row(row: int) -> Offer | None:
+    return next((o for o in await get_offers() if o.row == row), None)
+
+
+# ===================== Правки админов (write-behind) =====================
+
+# Редактируемые поля Offer -> номер колонки в листе (1-based, см. _offer_from_row)
+EDITABLE_FIELDS = {"cap_day": 6, "status": 12}
+_NAME_COL, _GEO_COL = 2, 3  # имя и GEO оффера — по ним проверяем строку перед записью
+
+
+@dataclass
+class _Edit:
+    row: int
+    field: str
+    name: str      # имя и GEO оффера в строке — защита от сдвига строк в листе
+    geo: str
+    base: str      # значение в листе, поверх которого сделана правка (после записи — записанное)
+    value: str     # наше значение
+    flushed: bool = False
+    inflight: bool = False  # значение сейчас пишется в лист
+
+
+# Неподтверждённые правки: (строка, поле) -> правка. Повторная правка той же
+# ячейки перезаписывает value; base меняется только после записи в лист.
+_edits: Dict[tuple[int, str], _Edit] = {}
+_flush_lock = asyncio.Lock()
+
+
+def _reconcile(offers: List[Offer]) -> List[Offer]:
+    """
+    Сверить свежий снапшот из листа с нашими правками:
+    - в листе уже наше значение -> правка подтверждена, забываем её;
+    - в листе всё ещё base -> оставляем наше значение (и дописываем его при следующем flush);
+    - в листе что-то третье или строка сдвинулась -> побеждает лист, правку отбрасываем.
+    """
+    by_row = {o.row: o for o in offers}
+    for key, e in list(_edits.items()):
+        o = by_row.get(e.row)
+        if o is None or (o.name, o.geo) != (e.name, e.geo):
+            del _edits[key]
+            continue
+        if e.inflight:
+            # лист мог уже получить наше значение, а base ещё не обновлён —
+            # не сверяем, решит flush_edits
+            setattr(o, e.field, e.value)
+            continue
+        current = getattr(o, e.field)
+        if current == e.value:
+            del _edits[key]
+        elif current == e.base:
+            setattr(o, e.field, e.value)
+            e.flushed = False
+        else:
+            logger.info(f"Edit {e.field} row {e.row} dropped: sheet has newer value {current!r}")
+            del _edits[key]
+    return offers
+
+
+async def edit_offer(row: int, field: str, value: str) -> Offer | None:
+    """
+    Изменить поле оффера: сразу в кэше, в лист — при следующем flush.
+    Возвращает обновлённый оффер или None, если строки нет в снапшоте.
+    """
+    global _cache_ver
+    if field not in EDITABLE_FIELDS:
+        raise ValueError(f"Field {field!r} is not editable")
+    offer = await offer_by_row(row)
+    if offer is None:
+        return None
+
+    key = (row, field)
+    e = _edits.get(key)
+    if e is None:
+        if getattr(offer, field) != value:
+            _edits[key] = _Edit(row=row, field=field, name=offer.name, geo=offer.geo,
+                                base=getattr(offer, field), value=value)
+    elif value == e.base and not e.inflight:
+        # в листе уже это значение — писать нечего
+        del _edits[key]
+    else:
+        # если идёт запись, правку оставляем: следующий flush перепишет ячейку
+        e.value = value
+        e.flushed = False
+
+    setattr(offer, field, value)
+    _cache_ver += 1
+    return offer
+
+
+async def set_top(row: int, on: bool) -> Offer | None:
+    """Поставить/снять отметку «топ» в статусе оффера."""
+    offer = await offer_by_row(row)
+    if offer is None:
+        return None
+    if is_top(offer) == on:
+        return offer
+    status = offer.status or ""
+    if on:
+        status = f"{status} / Топ" if status.strip() else "Топ"
+    else:
+        status = _drop_top(status)
+    return await edit_offer(row, "status", status)
+
+
+def _drop_top(status: str) -> str:
+    """
+    Убрать из статуса слова с «топ» («Топ», «ТОП», «Топ-10», «Топ🔥») вместе с
+    лишними разделителями: «Активен, ТОП» -> «Активен», «А / Топ / Б» -> «А / Б».
+    """
+    parts = re.split(r"(\s*[,/;|]\s*)", status)
+    segments, seps = parts[0::2], parts[1::2]
+    out = ""
+    for i, seg in enumerate(segments):
+        seg = " ".join(w for w in seg.split() if not _TOP_RE.search(w))
+        if not seg:
+            continue
+        out = f"{out}{seps[i - 1]}{seg}" if out else seg
+    return out
+
+
+async def flush_edits() -> int:
+    """Записать накопленные правки в лист одним batch_update. Возвращает число ячеек."""
+    global _cache_ts
+    async with _flush_lock:
+        pending = [(e, e.value) for e in _edits.values() if not e.flushed]
+        if not pending:
+            return 0
+        for e, _ in pending:
+            e.inflight = True
+        try:
+            ws = await _offers_ws()
+
+            # С последнего обновления строки могли сдвинуться, а ячейки — поменяться
+            # руками: читаем имя/GEO каждой строки и текущие значения ячеек.
+            rows = sorted({e.row for e, _ in pending})
+            ranges = [f"{rowcol_to_a1(r, _NAME_COL)}:{rowcol_to_a1(r, _GEO_COL)}" for r in rows]
+            ranges += [rowcol_to_a1(e.row, EDITABLE_FIELDS[e.field]) for e, _ in pending]
+            got = await ws.batch_get(ranges)
+            ids = {}
+            for r, vr in zip(rows, got):
+                cells = list(vr[0]) if vr and vr[0] else []
+                cells += [""] * (2 - len(cells))
+                ids[r] = (str(cells[0]), str(cells[1]))
+            cells = [str(vr[0][0]) if vr and vr[0] else "" for vr in got[len(rows):]]
+
+            to_write = []
+            for (e, value), current in zip(pending, cells):
+                if ids[e.row] != (e.name, e.geo):
+                    reason = f"row {e.row} now holds {ids[e.row]!r}"
+                elif current != e.base:
+                    reason = f"sheet has newer value {current!r}"
+                else:
+                    to_write.append((e, value))
+                    continue
+                logger.warning(f"Edit {e.field} for {e.name!r} dropped: {reason}")
+                if _edits.get((e.row, e.field)) is e:
+                    del _edits[(e.row, e.field)]
+                _cache_ts = None  # перечитать лист при следующем обращении
+            if not to_write:
+                return 0
+
+            data = [
+                {"range": rowcol_to_a1(e.row, EDITABLE_FIELDS[e.field]), "values": [[value]]}
+                for e, value in to_write
+            ]
+            # как будто ввёл человек: числа остаются числами, формулы на колонке не ломаются;
+            # в ответ просим то, что лист покажет после форматирования ("1000" -> "1 000")
+            resp = await ws.batch_update(
+                data,
+                value_input_option="USER_ENTERED",
+                include_values_in_response=True,
+                response_value_render_option="FORMATTED_VALUE",
+            )
+            responses = (resp or {}).get("responses", [])
+            by_row = {o.row: o for o in _cache}
+            for i, (e, value) in enumerate(to_write):
+                stored = value
+                if i < len(responses):
+                    vals = responses[i].get("updatedData", {}).get("values") or [[""]]
+                    stored = str(vals[0][0]) if vals[0] else ""
+                e.base = stored
+                # если ячейку успели поправить ещё раз во время записи — она уйдёт в следующий flush
+                if e.value == value:
+                    e.value = stored
+                    e.flushed = True
+                    o = by_row.get(e.row)
+                    if o is not None and (o.name, o.geo) == (e.name, e.geo):
+                        setattr(o, e.field, stored)
+            return len(to_write)
+        finally:
+            for e, _ in pending:
+                e.inflight = False
+
+
+async def write_behind_loop() -> None:
+    """Фоновая задача: раз в write_flush_sec сбрасывает правки в лист."""
+    interval = int(getattr(settings, "write_flush_sec", 5) or 5)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_edits()
+        except Exception as exc:
+            # правки остаются неотправленными, попробуем в следующий раз
+            logger.warning(f"Flushing offer edits failed: {exc}")
 
 
 # ===================== Доступ (партнёры) =====================